@@ -0,0 +1,157 @@
+"""
+Bulk directory listing for macOS, built on getattrlistbulk(2).
+
+getattrlistbulk returns the name and type of many directory entries per
+system call. 'scandir' below is a drop-in replacement for os.scandir as
+used by the indexer (name, path, is_dir, is_file).
+
+If libc or getattrlistbulk cannot be loaded, 'scandir' is plain
+os.scandir, so importing this module is always safe.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import struct
+from contextlib import contextmanager
+
+# --- Constants from <sys/attr.h> and <sys/vnode.h> ---
+ATTR_BIT_MAP_COUNT = 5
+ATTR_CMN_NAME = 0x00000001
+ATTR_CMN_OBJTYPE = 0x00000008
+ATTR_CMN_ERROR = 0x20000000
+ATTR_CMN_RETURNED_ATTRS = 0x80000000
+
+VREG = 1
+VDIR = 2
+VLNK = 5
+
+# Size of the result buffer handed to each getattrlistbulk call
+BUFFER_SIZE = 65536
+
+# Per-entry layout: u_int32 length, attribute_set_t (5 x u_int32),
+# optional u_int32 error, attrreference_t name, fsobj_type_t type.
+_HEADER = struct.Struct("=I5I")
+_UINT32 = struct.Struct("=I")
+_ATTRREF = struct.Struct("=iI")
+
+
+class _AttrList(ctypes.Structure):
+    _fields_ = [
+        ("bitmapcount", ctypes.c_ushort),
+        ("reserved", ctypes.c_uint16),
+        ("commonattr", ctypes.c_uint32),
+        ("volattr", ctypes.c_uint32),
+        ("dirattr", ctypes.c_uint32),
+        ("fileattr", ctypes.c_uint32),
+        ("forkattr", ctypes.c_uint32),
+    ]
+
+
+class BulkEntry:
+    """
+    A minimal stand-in for os.DirEntry, filled from getattrlistbulk.
+    """
+
+    __slots__ = ("name", "path", "_objtype")
+
+    def __init__(self, name: str, path: str, objtype: int):
+        self.name = name
+        self.path = path
+        self._objtype = objtype
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        if self._objtype == VLNK and follow_symlinks:
+            return os.path.isdir(self.path)
+        return self._objtype == VDIR
+
+    def is_file(self, follow_symlinks: bool = True) -> bool:
+        if self._objtype == VLNK and follow_symlinks:
+            return os.path.isfile(self.path)
+        return self._objtype == VREG
+
+
+def _load_getattrlistbulk():
+    """
+    Returns the libc getattrlistbulk function, or None if unavailable.
+    """
+    libc_path = ctypes.util.find_library("c")
+    if not libc_path:
+        return None
+    try:
+        libc = ctypes.CDLL(libc_path, use_errno=True)
+        func = libc.getattrlistbulk
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = [
+        ctypes.c_int,
+        ctypes.POINTER(_AttrList),
+        ctypes.c_void_p,
+        ctypes.c_size_t,
+        ctypes.c_uint64,
+    ]
+    func.restype = ctypes.c_int
+    return func
+
+
+_getattrlistbulk = _load_getattrlistbulk()
+
+
+def _iter_entries(fd: int, path: str):
+    """
+    Yields a BulkEntry for every child of the open directory 'fd'.
+    """
+    attrlist = _AttrList()
+    attrlist.bitmapcount = ATTR_BIT_MAP_COUNT
+    attrlist.commonattr = (
+        ATTR_CMN_RETURNED_ATTRS | ATTR_CMN_NAME | ATTR_CMN_ERROR | ATTR_CMN_OBJTYPE
+    )
+    buf = ctypes.create_string_buffer(BUFFER_SIZE)
+
+    while True:
+        count = _getattrlistbulk(fd, ctypes.byref(attrlist), buf, BUFFER_SIZE, 0)
+        if count < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        if count == 0:
+            return
+
+        offset = 0
+        for _ in range(count):
+            length, returned, *_ = _HEADER.unpack_from(buf, offset)
+            cursor = offset + _HEADER.size
+
+            if returned & ATTR_CMN_ERROR:
+                cursor += _UINT32.size
+
+            name = None
+            if returned & ATTR_CMN_NAME:
+                # The name offset is relative to the attrreference_t itself,
+                # and the length includes the trailing NUL.
+                name_offset, name_length = _ATTRREF.unpack_from(buf, cursor)
+                start = cursor + name_offset
+                name = os.fsdecode(buf[start : start + name_length - 1])
+                cursor += _ATTRREF.size
+
+            objtype = 0
+            if returned & ATTR_CMN_OBJTYPE:
+                (objtype,) = _UINT32.unpack_from(buf, cursor)
+
+            if name is not None:
+                yield BulkEntry(name, os.path.join(path, name), objtype)
+            offset += length
+
+
+@contextmanager
+def _bulk_scandir(path: str):
+    """
+    Lists 'path' with getattrlistbulk, mirroring 'with os.scandir(path)'.
+    """
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        yield _iter_entries(fd, path)
+    finally:
+        os.close(fd)
+
+
+scandir = _bulk_scandir if _getattrlistbulk is not None else os.scandir
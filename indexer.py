@@ -1,10 +1,29 @@
+import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker, Session
-from models import Video, MEDIA_DIR, engine, SessionLocal
+from models import (
+    Video,
+    FolderSummary,
+    MEDIA_DIR,
+    engine,
+    SessionLocal,
+    create_fts_triggers,
+    drop_fts_triggers,
+    rebuild_fts,
+)
 from tqdm import tqdm
 from contextlib import contextmanager
 
+# On macOS, list directories with getattrlistbulk (see _scan_macos.py)
+if sys.platform == "darwin":
+    from _scan_macos import scandir as _scandir
+else:
+    _scandir = os.scandir
+
 # --- Configuration ---
 
 # 1. Allowed video file extensions (using a set for fast lookup)
@@ -19,17 +38,42 @@ VIDEO_EXTENSIONS = {
     ".mpeg",
     ".mpg",
 }
+# str.endswith() accepts a tuple and checks it in C, with no splitext
+VIDEO_EXTENSIONS_TUPLE = tuple(VIDEO_EXTENSIONS)
 
 # 2. Folders to completely skip (system folders, recycle bins, etc.)
 # We check if a folder *name* (not the full path) is in this set.
-SKIP_FOLDERS = {
-    "@eaDir",
-    "$RECYCLE.BIN",
-    "System Volume Information",
-    ".DS_Store",
-    ".thumbnails",
-    ".recycle",
-}
+SKIP_FOLDERS = frozenset(
+    {
+        "@eaDir",
+        "$RECYCLE.BIN",
+        "System Volume Information",
+        ".DS_Store",
+        ".thumbnails",
+        ".recycle",
+    }
+)
+
+# 3. Batch size for bulk inserts (one executemany per batch).
+INSERT_BATCH_SIZE = 1000
+
+# 4. Above this many new videos, secondary indexes are dropped before the
+# insert and rebuilt once afterwards (much cheaper than per-row upkeep).
+BULK_LOAD_THRESHOLD = 5000
+
+# 5. Number of threads walking top-level folders concurrently.
+# Directory reads release the GIL, so this overlaps disk/network latency.
+SCAN_WORKERS = 8
+
+# 6. Progress bar settings shared by every tqdm bar.
+# Redraw at most twice a second, and stay silent when stderr (where tqdm
+# writes) is not a terminal, e.g. under cron or CI.
+TQDM_OPTIONS = {"mininterval": 0.5, "disable": not sys.stderr.isatty()}
+
+# Every scanned path starts with MEDIA_DIR plus a separator, so the
+# relative path is a plain slice instead of os.path.relpath().
+_MEDIA_PREFIX = os.path.join(MEDIA_DIR, "")
+_PREFIX_LEN = len(_MEDIA_PREFIX)
 
 
 @contextmanager
@@ -46,63 +90,192 @@ def get_session():
         session.close()
 
 
+def _scan_dir(path: str):
+    """
+    Reads a single directory with os.scandir (getattrlistbulk on macOS).
+
+    Each entry carries the file type from the directory read itself, so
+    regular files and folders need no extra stat() call.
+
+    Returns:
+        A tuple of (subdirectory paths, full video file paths).
+    """
+    subdirs = []
+    found = []
+    try:
+        with _scandir(path) as it:
+            for entry in it:
+                name = entry.name
+
+                # --- Filter 1: Skip Folders / Junk Files ---
+                # Skip system folders and macOS metadata files
+                if name[:2] == "._" or name in SKIP_FOLDERS:
+                    continue
+
+                # Never follow directory symlinks (same as os.walk)
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+
+                # --- Filter 2: Video Extensions ---
+                elif name.lower().endswith(VIDEO_EXTENSIONS_TUPLE) and entry.is_file():
+                    found.append(entry.path)
+    except OSError as e:
+        print(f"Warning: Could not read directory {path}. Error: {e}")
+    return subdirs, found
+
+
+def _walk(root: str):
+    """
+    Walks 'root' depth-first, one directory at a time.
+
+    Yields:
+        A list of full video file paths for each directory visited.
+    """
+    stack = [root]
+    while stack:
+        subdirs, found = _scan_dir(stack.pop())
+        stack.extend(subdirs)
+        yield found
+
+
+def _scan_subtree(root: str) -> set:
+    """
+    Collects the relative paths of every video below 'root'.
+    Runs inside a worker thread of scan_disk_paths.
+    """
+    paths = set()
+    for video_paths in _walk(root):
+        paths.update(full_path[_PREFIX_LEN:] for full_path in video_paths)
+    return paths
+
+
 def scan_disk_paths() -> set:
     """
     Scans the MEDIA_DIR for all valid video files.
 
     Applies the VIDEO_EXTENSIONS and SKIP_FOLDERS filters.
+    Each top-level folder is walked in its own worker thread.
 
     Returns:
         A set of relative file paths (e.g., "Tutorials/Go/video1.mp4")
     """
     print(f"Starting scan of '{MEDIA_DIR}'...")
-    disk_paths = set()
-
-    # We wrap os.walk in tqdm for a progress bar
-    # Note: This progress bar updates per-directory, not per-file
-    file_count = 0
-    for root, dirs, files in tqdm(
-        os.walk(MEDIA_DIR, topdown=True), desc="Scanning directories"
-    ):
-
-        # --- Filter 1: Skip Folders ---
-        # Modify 'dirs' in-place to prevent os.walk from descending into them
-        dirs[:] = [d for d in dirs if d not in SKIP_FOLDERS]
-
-        for file in files:
-
-            # --- NEW: Filter 3: Junk Files ---
-            # Skip macOS metadata files or other common junk files
-            if file.startswith("._") or file == ".DS_Store":
-                continue
-
-            # --- Filter 2: Video Extensions ---
-            if os.path.splitext(file)[1].lower() in VIDEO_EXTENSIONS:
-                try:
-                    full_path = os.path.join(root, file)
-                    # Get the relative path from the media_dir base
-                    relative_path = os.path.relpath(full_path, MEDIA_DIR)
-                    disk_paths.add(relative_path)
-                    file_count += 1
-                except Exception as e:
-                    print(f"Warning: Could not process file {full_path}. Error: {e}")
-
-    print(f"Scan complete. Found {file_count} video files on disk.")
+
+    # Videos sitting directly in MEDIA_DIR are handled here; every
+    # top-level folder becomes one task for the thread pool.
+    top_dirs, top_files = _scan_dir(MEDIA_DIR)
+    disk_paths = set(full_path[_PREFIX_LEN:] for full_path in top_files)
+
+    # Note: This progress bar updates per top-level folder, not per-file
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        futures = [executor.submit(_scan_subtree, top_dir) for top_dir in top_dirs]
+        with tqdm(
+            total=len(futures), desc="Scanning folders", **TQDM_OPTIONS
+        ) as progress:
+            # Results are merged here, on the main thread, so no lock is needed
+            for future in as_completed(futures):
+                disk_paths.update(future.result())
+                progress.update()
+
+    print(f"Scan complete. Found {len(disk_paths)} video files on disk.")
     return disk_paths
 
 
-def get_db_paths(session: Session) -> set:
+def get_db_paths(session: Session):
     """
-    Gets the relative paths of all videos currently in the database.
+    Streams the relative paths of all videos currently in the database.
+
+    Paths come back in sorted order, straight from the UNIQUE(path) index,
+    and are fetched in batches rather than loaded all at once.
 
     Returns:
-        A set of relative file paths.
+        An iterator of relative file paths, in ascending order.
     """
     print("Fetching existing video paths from database...")
-    paths = session.query(Video.path).all()
-    db_paths = set(row[0] for row in paths)
-    print(f"Found {len(db_paths)} videos in database.")
-    return db_paths
+    stmt = select(Video.path).order_by(Video.path).execution_options(yield_per=50000)
+    return session.execute(stmt).scalars()
+
+
+def diff_sorted_paths(db_paths, disk_paths):
+    """
+    Compares two ascending streams of paths with a single merge pass.
+
+    Neither side has to be held as a set; only the differences are kept.
+
+    Returns:
+        A tuple of (paths_to_add, paths_to_remove, db_count).
+    """
+    paths_to_add = []
+    paths_to_remove = []
+    db_count = 0
+
+    disk_iter = iter(disk_paths)
+    disk_path = next(disk_iter, None)
+    for db_path in db_paths:
+        db_count += 1
+        # Disk paths sorting before this DB path are not in the DB yet
+        while disk_path is not None and disk_path < db_path:
+            paths_to_add.append(disk_path)
+            disk_path = next(disk_iter, None)
+
+        if disk_path == db_path:
+            disk_path = next(disk_iter, None)
+        else:
+            paths_to_remove.append(db_path)
+
+    # Whatever is left on disk sorts after every DB path
+    if disk_path is not None:
+        paths_to_add.append(disk_path)
+        paths_to_add.extend(disk_iter)
+
+    return paths_to_add, paths_to_remove, db_count
+
+
+def drop_secondary_indexes(session: Session):
+    """
+    Drops the non-unique indexes on the videos table, and the triggers
+    feeding the full-text index, ahead of a bulk load.
+
+    The UNIQUE constraint on 'path' is not an Index object and is left
+    untouched, since the sync logic relies on it.
+    """
+    print("Dropping secondary indexes for bulk load...")
+    conn = session.connection()
+    for index in Video.__table__.indexes:
+        index.drop(bind=conn, checkfirst=True)
+    drop_fts_triggers(conn)
+
+
+def rebuild_secondary_indexes():
+    """
+    Recreates any missing indexes on the videos table, rebuilds the
+    full-text index in one pass and refreshes the query planner statistics.
+    """
+    print("Rebuilding secondary indexes...")
+    with engine.begin() as conn:
+        for index in Video.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
+        create_fts_triggers(conn)
+        rebuild_fts(conn)
+        conn.execute(text("ANALYZE videos"))
+
+
+def refresh_folder_summary(session: Session):
+    """
+    Rebuilds the folder_summary table from the current videos table.
+    Runs inside the sync transaction, so readers never see it half-built.
+    """
+    print("Refreshing folder summary...")
+    summary = FolderSummary.__table__
+    session.execute(summary.delete())
+    session.execute(
+        summary.insert().from_select(
+            ["container_folder", "video_count"],
+            select(Video.container_folder, func.count(Video.id)).group_by(
+                Video.container_folder
+            ),
+        )
+    )
 
 
 def sync_database():
@@ -110,49 +283,90 @@ def sync_database():
     Main synchronization function.
     Implements the "Add New, Remove Old" logic.
     """
-    with get_session() as session:
-        # Step 1: Get all paths from the DB
-        db_paths = get_db_paths(session)
-
-        # Step 2: Scan all valid paths from the Disk
-        disk_paths = scan_disk_paths()
-
-        # Step 3: Calculate differences
-        paths_to_add = disk_paths - db_paths
-        paths_to_remove = db_paths - disk_paths
-
-        # --- Step 4: Add New Videos ---
-        if paths_to_add:
-            print(f"Adding {len(paths_to_add)} new videos to the database...")
-            new_videos = []
-            for path in tqdm(paths_to_add, desc="Adding videos"):
-                container = os.path.dirname(path)
-                title = os.path.splitext(os.path.basename(path))[0]
-
-                new_videos.append(
-                    Video(
-                        title=title,
-                        path=path,
-                        container_folder=container,
-                        tags="",  # Default to empty tags
+    indexes_dropped = False
+    try:
+        with get_session() as session:
+            # Step 1: Scan all valid paths from the Disk
+            # (sorted, so it can be merged against the DB index order)
+            disk_paths = sorted(scan_disk_paths())
+
+            # Step 2: Stream all paths from the DB
+            db_paths = get_db_paths(session)
+
+            # Step 3: Calculate differences
+            paths_to_add, paths_to_remove, db_count = diff_sorted_paths(
+                db_paths, disk_paths
+            )
+            print(f"Found {db_count} videos in database.")
+
+            # --- Step 4: Add New Videos ---
+            if paths_to_add:
+                print(f"Adding {len(paths_to_add)} new videos to the database...")
+                if len(paths_to_add) > BULK_LOAD_THRESHOLD:
+                    drop_secondary_indexes(session)
+                    indexes_dropped = True
+
+                rows = []
+                for path in paths_to_add:
+                    # One C-level rpartition each, instead of the
+                    # dirname/basename/splitext chain. Every path ends in a
+                    # video extension, so the title is what precedes it.
+                    container, _, filename = path.rpartition(os.sep)
+                    title = filename.rpartition(".")[0] or filename
+
+                    rows.append(
+                        {
+                            "title": title,
+                            "path": path,
+                            "container_folder": container,
+                            "tags": "",  # Default to empty tags
+                        }
                     )
+
+                # Core insert + list of dicts = one executemany per batch,
+                # bypassing the ORM unit-of-work entirely. The UPSERT clause
+                # skips a path that appeared since the diff (e.g. a
+                # concurrent run) instead of failing the whole sync.
+                insert_stmt = sqlite_insert(Video.__table__).on_conflict_do_nothing(
+                    index_elements=["path"]
                 )
-            session.add_all(new_videos)
-
-        # --- Step 5: Remove Old Videos ---
-        if paths_to_remove:
-            print(f"Removing {len(paths_to_remove)} old video entries...")
-            # This is more efficient for large deletes
-            session.query(Video).filter(Video.path.in_(paths_to_remove)).delete(
-                synchronize_session=False
-            )
+                for start in tqdm(
+                    range(0, len(rows), INSERT_BATCH_SIZE),
+                    desc="Adding videos",
+                    **TQDM_OPTIONS,
+                ):
+                    session.execute(
+                        insert_stmt, rows[start : start + INSERT_BATCH_SIZE]
+                    )
 
-        # Commit is handled by the 'get_session' context manager
-        print("\n--- Sync Summary ---")
-        print(f"Added:   {len(paths_to_add)} new videos")
-        print(f"Removed: {len(paths_to_remove)} old entries")
-        print(f"Total:   {len(disk_paths)} videos in catalog.")
-        print("Database synchronization complete.")
+            # --- Step 5: Remove Old Videos ---
+            if paths_to_remove:
+                print(f"Removing {len(paths_to_remove)} old video entries...")
+                # One DELETE for any number of paths: they are passed as a
+                # single JSON array and expanded by json_each, so there is no
+                # bound-parameter limit to chunk around.
+                removed = func.json_each(json.dumps(paths_to_remove)).table_valued(
+                    "value"
+                )
+                session.execute(
+                    Video.__table__.delete().where(
+                        Video.path.in_(select(removed.c.value))
+                    )
+                )
+
+            # --- Step 6: Refresh the home page summary ---
+            refresh_folder_summary(session)
+
+            # Commit is handled by the 'get_session' context manager
+            print("\n--- Sync Summary ---")
+            print(f"Added:   {len(paths_to_add)} new videos")
+            print(f"Removed: {len(paths_to_remove)} old entries")
+            print(f"Total:   {len(disk_paths)} videos in catalog.")
+            print("Database synchronization complete.")
+    finally:
+        # Runs after the commit (or rollback), so indexes always come back
+        if indexes_dropped:
+            rebuild_secondary_indexes()
 
 
 if __name__ == "__main__":
@@ -168,8 +382,10 @@ if __name__ == "__main__":
     db_file = engine.url.database
     if not os.path.exists(db_file):
         print(f"Database file not found. Creating new database at: {db_file}")
-        from models import create_db_and_tables
 
-        create_db_and_tables()
+    # create_all only adds missing tables, so this also upgrades older databases
+    from models import create_db_and_tables
+
+    create_db_and_tables()
 
     sync_database()
@@ -1,5 +1,15 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Index
+from sqlalchemy import (
+    create_engine,
+    event,
+    text,
+    table,
+    column,
+    Column,
+    Integer,
+    String,
+    Index,
+)
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # --- Configuration Constants ---
@@ -8,12 +18,37 @@ MEDIA_DIR = "/media/wezterm"
 # The path to the SQLite database file
 DATABASE_URL = "sqlite:///videos.db"
 
+# PRAGMAs applied to every new SQLite connection.
+# WAL lets the Streamlit app read while the indexer writes, and
+# synchronous=NORMAL avoids an fsync on every commit in WAL mode.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",  # 64 MB page cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA busy_timeout=60000",
+)
+
 # --- SQLAlchemy Setup ---
 Base = declarative_base()
-engine = create_engine(DATABASE_URL)
+# The default pool keeps connections open and reuses them, so the
+# PRAGMAs below are only paid once per physical connection.
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(bind=engine)
 
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tunes each new SQLite connection for bulk writes and concurrent reads.
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
 # --- The "UI-Aware" Video Model ---
 class Video(Base):
     """
@@ -32,23 +67,150 @@ class Video(Base):
     path = Column(String(1024), nullable=False, unique=True)
 
     # The "container folder" for grouping (e.g., "Tutorials/Go")
-    # We add an index for fast grouping and searching.
-    container_folder = Column(String(768), nullable=False, index=True)
+    # Indexed through ix_folder_covering below.
+    container_folder = Column(String(768), nullable=False)
 
     # Tags for searching
     tags = Column(String(512), nullable=True, index=True)
 
 
-# Add indexes for columns we will search frequently
-Index("ix_video_title_tags", Video.title, Video.tags)
+# Covering index for the folder drill-down
+# (WHERE container_folder = ? ORDER BY title): rows come back already
+# sorted, and every selected column is read from the index itself.
+Index(
+    "ix_folder_covering",
+    Video.container_folder,
+    Video.title,
+    Video.path,
+    Video.tags,
+)
+
+# Indexes from earlier schema versions, dropped by create_db_and_tables
+OBSOLETE_INDEXES = ("ix_video_title_tags", "ix_videos_container_folder")
+
+
+# --- Materialized Home Page Summary ---
+class FolderSummary(Base):
+    """
+    Video count per container folder, rebuilt by the indexer on every sync.
+    The home page reads this instead of grouping the whole videos table.
+    """
+
+    __tablename__ = "folder_summary"
+
+    container_folder = Column(String(768), primary_key=True)
+
+    # Indexed so "ORDER BY video_count DESC LIMIT 50" is a short index walk
+    video_count = Column(Integer, nullable=False, index=True)
+
+
+# --- Full-Text Search ---
+# An external-content FTS5 index over videos(title, tags, path). The text
+# lives only in 'videos'; the FTS table stores the inverted index, keyed
+# by videos.id (its rowid).
+# The trigram tokenizer (SQLite 3.34+) indexes every 3-character window,
+# so any substring of 3+ characters is an index lookup, like ILIKE '%q%'.
+FTS_TOKENIZE = "tokenize='trigram'"
+FTS_TABLE_DDL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+    title, tags, path,
+    content='videos', content_rowid='id',
+    {FTS_TOKENIZE}
+)
+"""
+
+# Triggers that keep videos_fts in step with single-row writes.
+# The indexer drops them during bulk loads and rebuilds the index instead.
+FTS_TRIGGERS_DDL = (
+    """
+    CREATE TRIGGER IF NOT EXISTS videos_ai AFTER INSERT ON videos BEGIN
+        INSERT INTO videos_fts(rowid, title, tags, path)
+        VALUES (new.id, new.title, new.tags, new.path);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS videos_ad AFTER DELETE ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, tags, path)
+        VALUES ('delete', old.id, old.title, old.tags, old.path);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS videos_au AFTER UPDATE ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, tags, path)
+        VALUES ('delete', old.id, old.title, old.tags, old.path);
+        INSERT INTO videos_fts(rowid, title, tags, path)
+        VALUES (new.id, new.title, new.tags, new.path);
+    END
+    """,
+)
+FTS_TRIGGER_NAMES = ("videos_ai", "videos_ad", "videos_au")
+
+# Lightweight handle for querying videos_fts. It is deliberately not part
+# of Base.metadata, since create_all cannot create virtual tables.
+# The hidden column named after the table is the MATCH target.
+videos_fts = table("videos_fts", column("rowid"), column("videos_fts"))
+
+
+def create_fts_triggers(conn):
+    """
+    Installs the triggers that keep videos_fts in sync with videos.
+    """
+    for ddl in FTS_TRIGGERS_DDL:
+        conn.execute(text(ddl))
+
+
+def drop_fts_triggers(conn):
+    """
+    Removes the videos_fts sync triggers (used around bulk loads).
+    """
+    for name in FTS_TRIGGER_NAMES:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+
+
+def rebuild_fts(conn):
+    """
+    Rebuilds the whole videos_fts index from the videos table.
+    """
+    conn.execute(text("INSERT INTO videos_fts(videos_fts) VALUES ('rebuild')"))
 
 
 def create_db_and_tables():
     """
     One-time function to create the database schema.
+    Safe to re-run: only missing tables, indexes and triggers are created.
     """
     print("Creating database tables...")
     Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # create_all skips tables that already exist, so bring their
+        # indexes up to date explicitly
+        existing = set(
+            conn.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'index'")
+            ).scalars()
+        )
+        stale = [name for name in OBSOLETE_INDEXES if name in existing]
+        missing = [i for i in Video.__table__.indexes if i.name not in existing]
+        for name in stale:
+            conn.execute(text(f"DROP INDEX {name}"))
+        for index in missing:
+            index.create(bind=conn)
+        if stale or missing:
+            # Let the query planner see the new indexes
+            conn.execute(text("ANALYZE videos"))
+
+        fts_sql = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE name = 'videos_fts'")
+        ).scalar()
+        fts_current = fts_sql is not None and FTS_TOKENIZE in fts_sql
+        if fts_sql is not None and not fts_current:
+            # Built with an older tokenizer; replace it
+            conn.execute(text("DROP TABLE videos_fts"))
+        conn.execute(text(FTS_TABLE_DDL))
+        create_fts_triggers(conn)
+        if not fts_current:
+            # Index any videos that predate the FTS table
+            rebuild_fts(conn)
     print("Database tables created successfully.")
 
 
@@ -1,35 +1,62 @@
 import streamlit as st
 import os
-from sqlalchemy import func, desc
-from sqlalchemy.orm import Session
-from models import Video, MEDIA_DIR, SessionLocal, engine
-from contextlib import contextmanager
+import sqlite3
+import threading
+from sqlalchemy import func, desc, select, update, delete
+from models import Video, FolderSummary, MEDIA_DIR, engine, videos_fts
 import time
 
 # --- Page Configuration ---
 st.set_page_config(layout="wide", page_title="Video Manager")
 
 
-# --- Database Session ---
-@contextmanager
-def get_session():
-    """Provides a transactional scope around a series of operations."""
-    session = SessionLocal()
-    try:
-        yield session
-        session.commit()
-    except Exception:
-        session.rollback()
-        raise
-    finally:
-        session.close()
+# --- Data Functions (Cached) ---
+# Reads run as Core selects on a pooled connection ('with engine.connect()'),
+# so a rerun borrows an already-open, already-tuned SQLite connection
+# instead of building an ORM session.
+#
+# Cached functions take the current 'data_version' as an argument, so it
+# is part of their cache key: any committed write (from this app, another
+# tab or the indexer) changes the version and the next call misses the
+# cache. Stale entries simply age out through the TTL.
+
+
+@st.cache_resource
+def _data_version_connection():
+    """
+    A dedicated connection used only to ask SQLite whether the database
+    changed. It never writes, so every commit counts as coming from
+    "another connection" and bumps its PRAGMA data_version.
+    """
+    conn = sqlite3.connect(engine.url.database, check_same_thread=False)
+    return conn, threading.Lock()
 
 
-# --- Data Functions (Cached) ---
+def get_data_version() -> int:
+    """
+    Returns a number that changes whenever the database has been written.
+    One O(1) PRAGMA, no table access.
+    """
+    conn, lock = _data_version_connection()
+    with lock:
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+# The trigram index can only look up terms of at least this many characters
+MIN_FTS_TERM_LENGTH = 3
+
+
+def to_fts_query(terms: list) -> str:
+    """
+    Turns search words into an FTS5 MATCH expression.
+    Each word is quoted (so punctuation is literal) and matched as a
+    substring; all words must appear somewhere in title, tags or path.
+    """
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
 
 
 @st.cache_data(ttl=600)
-def search_topic_folders(query: str):
+def search_topic_folders(query: str, data_version: int):
     """
     Runs the "UI-Aware" query to find folders matching a topic.
     This powers the "Netflix-style" home page.
@@ -37,67 +64,78 @@ def search_topic_folders(query: str):
     Returns:
         List of plain dictionaries, suitable for caching.
     """
-    with get_session() as session:
-        if not query:
-            # If no query, show all top-level folders by video count
-            stmt = (
-                session.query(
-                    Video.container_folder,
-                    func.count(Video.id).label("video_count"),
-                )
-                .group_by(Video.container_folder)
-                .order_by(desc("video_count"))
-                .limit(50)
+    terms = query.split()
+    if not terms:
+        # If no query, show the biggest folders from the summary table
+        # that the indexer maintains (no GROUP BY over all videos)
+        stmt = (
+            select(FolderSummary.container_folder, FolderSummary.video_count)
+            .order_by(desc(FolderSummary.video_count))
+            .limit(50)
+        )
+    else:
+        # If query, search title, tags, and path
+        stmt = (
+            select(
+                Video.container_folder,
+                func.count(Video.id).label("video_count"),
             )
-        else:
-            # If query, search title, tags, and path
-            search_term = f"%{query}%"
-            stmt = (
-                session.query(
-                    Video.container_folder,
-                    func.count(Video.id).label("video_count"),
-                )
-                .filter(
+            .group_by(Video.container_folder)
+            .order_by(desc("video_count"))
+        )
+
+        # Words long enough for the trigram index are looked up there...
+        fts_terms = [t for t in terms if len(t) >= MIN_FTS_TERM_LENGTH]
+        if fts_terms:
+            stmt = stmt.join(videos_fts, videos_fts.c.rowid == Video.id).where(
+                videos_fts.c.videos_fts.match(to_fts_query(fts_terms))
+            )
+
+        # ...and the rare 1-2 character words fall back to ILIKE
+        for term in terms:
+            if len(term) < MIN_FTS_TERM_LENGTH:
+                search_term = f"%{term}%"
+                stmt = stmt.where(
                     (Video.title.ilike(search_term))
                     | (Video.tags.ilike(search_term))
                     | (Video.path.ilike(search_term))
                 )
-                .group_by(Video.container_folder)
-                .order_by(desc("video_count"))
-            )
 
-        # Convert SQLAlchemy results to plain dicts before session closes
-        results = stmt.all()
-        return [
-            {"container_folder": r.container_folder, "video_count": r.video_count}
-            for r in results
-        ]
+    with engine.connect() as conn:
+        results = conn.execute(stmt).all()
+
+    # Convert SQLAlchemy rows to plain dicts for caching
+    return [
+        {"container_folder": r.container_folder, "video_count": r.video_count}
+        for r in results
+    ]
 
 
 @st.cache_data(ttl=600)
-def get_videos_in_folder(folder_path: str, search_query: str = ""):
+def get_videos_in_folder(folder_path: str, search_query: str, data_version: int):
     """
     Gets all individual videos for the "drill-down" view.
 
     Returns:
         List of plain dictionaries, suitable for caching.
     """
-    with get_session() as session:
-        stmt = session.query(Video).filter(Video.container_folder == folder_path)
+    stmt = select(Video.id, Video.title, Video.path, Video.tags).where(
+        Video.container_folder == folder_path
+    )
 
-        if search_query:
-            search_term = f"%{search_query}%"
-            stmt = stmt.filter(
-                (Video.title.ilike(search_term)) | (Video.tags.ilike(search_term))
-            )
+    if search_query:
+        search_term = f"%{search_query}%"
+        stmt = stmt.where(
+            (Video.title.ilike(search_term)) | (Video.tags.ilike(search_term))
+        )
 
-        results = stmt.order_by(Video.title).all()
+    with engine.connect() as conn:
+        results = conn.execute(stmt.order_by(Video.title)).all()
 
-        # Convert Video objects to plain dicts before session closes
-        return [
-            {"id": v.id, "title": v.title, "path": v.path, "tags": v.tags}
-            for v in results
-        ]
+    # Convert SQLAlchemy rows to plain dicts for caching
+    return [
+        {"id": v.id, "title": v.title, "path": v.path, "tags": v.tags} for v in results
+    ]
 
 
 # --- State Management ---
@@ -122,7 +160,7 @@ def render_home_view():
 
     st.header("Topics" if search_query else "All Folders")
 
-    folders = search_topic_folders(search_query)
+    folders = search_topic_folders(search_query, get_data_version())
 
     if not folders:
         st.info(
@@ -148,7 +186,6 @@ def render_home_view():
                 st.session_state.view = "folder"
                 st.session_state.current_folder = folder
                 st.session_state.video_to_play = None  # Clear player
-                st.cache_data.clear()  # Clear cache to ensure fresh data
                 st.rerun()
         col_idx += 1
 
@@ -166,7 +203,6 @@ def render_folder_view():
             st.session_state.view = "home"
             st.session_state.current_folder = None
             st.session_state.video_to_play = None
-            st.cache_data.clear()
             st.rerun()
     with col2:
         st.header(folder_path)
@@ -188,7 +224,7 @@ def render_folder_view():
         "Search within this folder", key=f"search_{folder_path}"
     )
 
-    videos = get_videos_in_folder(folder_path, folder_search)
+    videos = get_videos_in_folder(folder_path, folder_search, get_data_version())
 
     if not videos:
         st.info(
@@ -229,12 +265,15 @@ def render_folder_view():
                         "Save", use_container_width=True
                     ):
                         try:
-                            with get_session() as session:
-                                session.query(Video).filter(
-                                    Video.id == video_data["id"]
-                                ).update({"title": new_title, "tags": new_tags})
+                            # Single-statement write: Core on a plain
+                            # transaction, no ORM session needed
+                            with engine.begin() as conn:
+                                conn.execute(
+                                    update(Video)
+                                    .where(Video.id == video_data["id"])
+                                    .values(title=new_title, tags=new_tags)
+                                )
                             st.toast(f"Updated '{new_title}'")
-                            st.cache_data.clear()
                             time.sleep(0.5)  # Give toast time to show
                             st.rerun()
                         except Exception as e:
@@ -244,12 +283,28 @@ def render_folder_view():
                         "Delete", type="primary", use_container_width=True
                     ):
                         try:
-                            with get_session() as session:
-                                session.query(Video).filter(
-                                    Video.id == video_data["id"]
-                                ).delete()
+                            with engine.begin() as conn:
+                                deleted = conn.execute(
+                                    delete(Video).where(Video.id == video_data["id"])
+                                ).rowcount
+                                # Keep the home page summary in step
+                                if deleted:
+                                    conn.execute(
+                                        update(FolderSummary)
+                                        .where(
+                                            FolderSummary.container_folder
+                                            == folder_path
+                                        )
+                                        .values(
+                                            video_count=FolderSummary.video_count - 1
+                                        )
+                                    )
+                                    conn.execute(
+                                        delete(FolderSummary).where(
+                                            FolderSummary.video_count <= 0
+                                        )
+                                    )
                             st.toast(f"Deleted '{video_data['title']}'")
-                            st.cache_data.clear()
                             time.sleep(0.5)
                             st.rerun()
                         except Exception as e: